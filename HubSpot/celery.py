@@ -0,0 +1,16 @@
+"""
+Celery config for HubSpot project.
+
+Фонові задачі (виклики HubSpot API) виконуються воркером разом з beat:
+    celery -A HubSpot worker --beat --loglevel=info
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'HubSpot.settings')
+
+app = Celery('HubSpot')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -86,6 +86,30 @@ else:
     }
 
 
+# Celery
+# Брокер для фонових задач (виклики HubSpot API з webhook)
+
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_ACCEPT_CONTENT = ['json']
+CELERY_TASK_ACKS_LATE = True
+CELERY_BEAT_SCHEDULE = {
+    # Пакетна обробка opportunity через batch API HubSpot
+    'flush-gigradar-opportunities': {
+        'task': 'integrations.tasks.flush_opportunities',
+        'schedule': 60.0,
+    },
+    # Пакетне збереження proposal подій з черги в Redis
+    'flush-gigradar-proposals': {
+        'task': 'integrations.tasks.flush_proposals',
+        'schedule': float(os.getenv('PROPOSAL_FLUSH_INTERVAL', '2.0')),
+    },
+}
+
+REDIS_URL = os.getenv('REDIS_URL', CELERY_BROKER_URL)
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', '0.5'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,101 @@
+"""
+Розбір даних proposal з webhook Gigradar у значення полів моделі
+
+Модуль не залежить від ORM і повністю анотований: setup.py компілює його
+mypyc у C-розширення (python setup.py build_ext --inplace). Схеми msgspec
+винесені в schemas.py, бо mypyc не компілює класи msgspec.Struct
+"""
+from typing import Any, Dict, Optional, Tuple
+from django.utils.dateparse import parse_datetime
+from integrations.schemas import job_client, parse_job
+
+# Поле моделі -> ключі в даних webhook, береться перше непорожнє значення
+_FIELD_MAP: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ('scanner_id', ('scannerId', 'scanner_id')),
+    ('scanner_name', ('scannerName', 'scanner_name')),
+    ('team_id', ('teamId', 'team_id')),
+    ('team_name', ('teamName', 'team_name')),
+)
+
+_DATE_FIELDS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ('sent_at', ('sent',)),
+    ('scheduled_at', ('scheduledAt',)),
+    ('created_at', ('createdAt', 'created_at')),
+)
+
+
+# error_code для помилок, про які Gigradar не передав код
+UNKNOWN_ERROR_CODE = 'unknown'
+
+
+def _first(data: Dict[str, Any], keys: Tuple[str, ...]) -> Any:
+    """Повертає перше непорожнє значення з data за ключами keys"""
+    for key in keys:
+        value = data.get(key)
+        if value:
+            return value
+    return None
+
+
+def parse_proposal_data(data: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    Розбирає дані proposal з webhook
+    
+    Args:
+        data: Дані з webhook події GIGRADAR.PROPOSAL.UPDATE
+    
+    Returns:
+        Пара (значення полів GigradarProposal, повідомлення про помилку)
+    """
+    # Витягуємо основні дані
+    proposal_id = _first(data, ('id', 'proposalId', '_id'))
+    if not proposal_id:
+        raise ValueError("Proposal ID не знайдено в даних")
+    
+    fields: Dict[str, Any] = {
+        'proposal_id': proposal_id,
+        'opportunity_id': _first(data, ('opportunityId', 'opportunity_id')) or '',
+        'job_id': _first(data, ('jobId', 'job_id')) or '',
+        'error_code': _first(data, ('errorCode', 'error_code'))
+            or (UNKNOWN_ERROR_CODE if _first(data, ('error', 'hasError')) else None),
+    }
+    
+    for field, keys in _FIELD_MAP:
+        fields[field] = _first(data, keys)
+    
+    # Статуси та дати
+    for field, keys in _DATE_FIELDS:
+        value = _first(data, keys)
+        if isinstance(value, str):
+            try:
+                value = parse_datetime(value)
+            except ValueError:
+                value = None
+        fields[field] = value
+    
+    # Дані про job
+    job = parse_job(data.get('job'))
+    if job is not None:
+        fields['job_title'] = job.title or job.job_title
+        fields['job_type'] = job.type or job.job_type
+        
+        budget = job.budget or job.hourly_rate or job.fixed_price
+        if budget:
+            try:
+                fields['job_budget'] = float(budget)
+            except (TypeError, ValueError):
+                pass
+        
+        # Дані про клієнта
+        client = job_client(job)
+        if client is not None:
+            fields['client_email'] = client.email
+            fields['client_name'] = client.name
+            fields['client_company'] = client.company
+        else:
+            # Якщо client - не об'єкт (рядок, id тощо)
+            fields['client_email'] = job.client_email
+            fields['client_name'] = job.client_name
+            fields['client_company'] = job.company_name
+    
+    return fields, _first(data, ('errorMessage', 'error_message'))
@@ -1,7 +1,28 @@
 from django.contrib import admin
+from django.core.exceptions import ValidationError
 from integrations.models import GigradarProposal
 
 
+class HasErrorFilter(admin.SimpleListFilter):
+    """Фільтр proposal за наявністю помилки (error_code)"""
+    
+    title = 'Чи є помилка'
+    parameter_name = 'has_error'
+    
+    def lookups(self, request, model_admin):
+        return (
+            ('1', 'Так'),
+            ('0', 'Ні'),
+        )
+    
+    def queryset(self, request, queryset):
+        if self.value() == '1':
+            return queryset.filter(error_code__isnull=False)
+        if self.value() == '0':
+            return queryset.filter(error_code__isnull=True)
+        return queryset
+
+
 @admin.register(GigradarProposal)
 class GigradarProposalAdmin(admin.ModelAdmin):
     """Admin інтерфейс для GigradarProposal"""
@@ -18,12 +39,13 @@ class GigradarProposalAdmin(admin.ModelAdmin):
     
     list_filter = [
         'status',
-        'has_error',
+        HasErrorFilter,
         'job_type',
         'created',
         'sent_at',
     ]
     
+    # Кожна колонка покрита trigram індексом на UPPER(col::text) (міграція 0009)
     search_fields = [
         'proposal_id',
         'opportunity_id',
@@ -39,8 +61,21 @@ class GigradarProposalAdmin(admin.ModelAdmin):
         'created',
         'updated',
         'raw_data',
+        'error_message',
+        'has_error',
     ]
     
+    # Для існуючих об'єктів readonly всі поля (без дублікатів, обчислюється один раз)
+    _OBJ_READONLY = tuple(dict.fromkeys(readonly_fields + [
+        'proposal_id', 'opportunity_id', 'job_id', 'status',
+        'sent_at', 'scheduled_at', 'created_at',
+        'has_error', 'error_code', 'error_message',
+        'job_title', 'job_budget', 'job_type',
+        'client_email', 'client_name', 'client_company',
+        'scanner_id', 'scanner_name', 'team_id', 'team_name',
+        'hubspot_contact_id', 'hubspot_deal_id',
+    ]))
+    
     fieldsets = (
         ('Основна інформація', {
             'fields': ('proposal_id', 'opportunity_id', 'job_id', 'status')
@@ -71,16 +106,25 @@ class GigradarProposalAdmin(admin.ModelAdmin):
     
     date_hierarchy = 'created'
     
+    # Список не показує пов'язаних об'єктів. Порожній кортеж, а не False:
+    # з False Django сам додає select_related() для FK з list_display
+    list_select_related = ()
+    
+    @admin.display(boolean=True, description='Чи є помилка')
+    def has_error(self, obj):
+        return obj.has_error
+    
+    def get_object(self, request, object_id, from_field=None):
+        """Payload (raw_data, error_message) підтягуємо тим самим запитом, що й proposal"""
+        queryset = self.get_queryset(request).select_related('payload')
+        model = queryset.model
+        field = model._meta.pk if from_field is None else model._meta.get_field(from_field)
+        try:
+            object_id = field.to_python(object_id)
+            return queryset.get(**{field.name: object_id})
+        except (model.DoesNotExist, ValidationError, ValueError):
+            return None
+    
     def get_readonly_fields(self, request, obj=None):
         """Всі поля readonly для існуючих об'єктів"""
-        if obj:
-            return self.readonly_fields + [
-                'proposal_id', 'opportunity_id', 'job_id', 'status',
-                'sent_at', 'scheduled_at', 'created_at',
-                'has_error', 'error_code', 'error_message',
-                'job_title', 'job_budget', 'job_type',
-                'client_email', 'client_name', 'client_company',
-                'scanner_id', 'scanner_name', 'team_id', 'team_name',
-                'hubspot_contact_id', 'hubspot_deal_id',
-            ]
-        return self.readonly_fields
+        return self._OBJ_READONLY if obj else self.readonly_fields
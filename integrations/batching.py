@@ -0,0 +1,75 @@
+"""
+Пакетне збереження proposal подій від Gigradar
+"""
+import logging
+from typing import Any, Dict, List
+from django.db import InterfaceError, OperationalError
+from integrations.dedup import mark_proposals_seen
+from integrations.models import GigradarProposal
+
+logger = logging.getLogger(__name__)
+
+
+def _upsert_one_by_one(batch: list) -> list:
+    """
+    Зберігає proposal поштучно, відкидаючи лише ті, що не вдалося зберегти
+
+    OperationalError та InterfaceError (БД недоступна) пробрасуються, щоб
+    пачка лишилась в черзі
+
+    Returns:
+        Список збережених пар (proposal, seen_key)
+    """
+    saved = []
+    for entry in batch:
+        proposal = entry[0]
+        try:
+            GigradarProposal.upsert_many([proposal])
+        except (OperationalError, InterfaceError):
+            raise
+        except Exception as e:
+            logger.error(f"Proposal {proposal.proposal_id} не збережено і відкинуто: {e}", exc_info=True)
+        else:
+            saved.append(entry)
+    return saved
+
+
+def save_proposals(entries: List[Dict[str, Any]]) -> int:
+    """
+    Зберігає пачку proposal з черги одним запитом
+
+    Якщо пачка не зберігається через окремий proposal, решта зберігається
+    поштучно: Gigradar вже отримав відповідь і не повторить ці події.
+    Після збереження події запам'ятовуються в Bloom filter
+
+    Args:
+        entries: Записи черги {"data": дані webhook, "seen_key": ключ події}
+
+    Returns:
+        Кількість збережених proposal
+
+    Raises:
+        OperationalError, InterfaceError: БД недоступна, пачку слід повторити
+    """
+    batch = []
+    for entry in entries:
+        try:
+            batch.append((GigradarProposal.build_from_webhook_data(entry["data"]), entry.get("seen_key")))
+        except Exception as e:
+            logger.error(f"Proposal не розібрано і відкинуто: {e}", exc_info=True)
+    if not batch:
+        return 0
+
+    try:
+        GigradarProposal.upsert_many([proposal for proposal, _ in batch])
+    except (OperationalError, InterfaceError):
+        raise
+    except Exception as e:
+        logger.warning(f"Пачку з {len(batch)} proposal не збережено, зберігаємо поштучно: {e}")
+        saved = _upsert_one_by_one(batch)
+    else:
+        saved = batch
+
+    mark_proposals_seen([seen_key for _, seen_key in saved if seen_key])
+    logger.info(f"Збережено пачку proposal в БД: {len(saved)}")
+    return len(saved)
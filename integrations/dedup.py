@@ -0,0 +1,67 @@
+"""
+Відсіювання повторних proposal подій від Gigradar до звернення в БД
+"""
+import hashlib
+import logging
+from typing import List
+import orjson
+from integrations.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Bloom filter в Redis (модуль RedisBloom): ~16 МБ на 10 млн подій при 0.1% хибних збігів
+SEEN_PROPOSALS_KEY = 'gigradar:seen_proposals'
+SEEN_PROPOSALS_CAPACITY = 10_000_000
+SEEN_PROPOSALS_ERROR_RATE = 0.001
+
+
+def proposal_seen_key(proposal_id: str, data: dict) -> str:
+    """
+    Ключ події proposal для Bloom filter
+    
+    Ключ враховує вміст події, тому зміна proposal завжди проходить далі
+    """
+    digest = hashlib.blake2b(orjson.dumps(data, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+    return f"gp:{proposal_id}:{digest}"
+
+
+def is_duplicate_proposal(seen_key: str) -> bool:
+    """
+    Перевіряє, чи ця ж версія proposal вже була збережена в БД
+    
+    Якщо Redis недоступний, подія вважається новою
+    
+    Args:
+        seen_key: Результат proposal_seen_key
+    
+    Returns:
+        True, якщо така сама подія вже була збережена
+    """
+    try:
+        return bool(get_redis().bf().exists(SEEN_PROPOSALS_KEY, seen_key))
+    except Exception as e:
+        logger.warning(f"Не вдалося перевірити дублікат proposal {seen_key}: {e}")
+        return False
+
+
+def mark_proposals_seen(seen_keys: List[str]) -> None:
+    """
+    Запам'ятовує події, які вже збережені в БД
+    
+    Викликається лише після успішного збереження, щоб повтор події,
+    яку не вдалося зберегти, не був відкинутий як дублікат
+    
+    Args:
+        seen_keys: Ключі з proposal_seen_key
+    """
+    if not seen_keys:
+        return
+    try:
+        get_redis().bf().insert(
+            SEEN_PROPOSALS_KEY,
+            seen_keys,
+            capacity=SEEN_PROPOSALS_CAPACITY,
+            error=SEEN_PROPOSALS_ERROR_RATE,
+        )
+    except Exception as e:
+        logger.warning(f"Не вдалося запам'ятати {len(seen_keys)} збережених proposal: {e}")
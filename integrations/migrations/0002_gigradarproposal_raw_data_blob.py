@@ -0,0 +1,44 @@
+# Generated by Django 5.2.10 on 2026-10-15 10:00
+
+import json
+import zlib
+
+from django.db import migrations, models
+
+
+def compress_raw_data(apps, schema_editor):
+    GigradarProposal = apps.get_model('integrations', 'GigradarProposal')
+    for proposal in GigradarProposal.objects.only('id', 'raw_data').iterator():
+        proposal.raw_data_blob = zlib.compress(
+            json.dumps(proposal.raw_data or {}, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+            3,
+        )
+        proposal.save(update_fields=['raw_data_blob'])
+
+
+def decompress_raw_data(apps, schema_editor):
+    GigradarProposal = apps.get_model('integrations', 'GigradarProposal')
+    for proposal in GigradarProposal.objects.only('id', 'raw_data_blob').iterator():
+        blob = proposal.raw_data_blob
+        proposal.raw_data = json.loads(zlib.decompress(blob)) if blob else {}
+        proposal.save(update_fields=['raw_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gigradarproposal',
+            name='raw_data_blob',
+            field=models.BinaryField(default=b'', help_text='Повні дані з webhook у форматі JSON, стиснуті zlib'),
+        ),
+        migrations.RunPython(compress_raw_data, decompress_raw_data),
+        migrations.RemoveField(
+            model_name='gigradarproposal',
+            name='raw_data',
+        ),
+    ]
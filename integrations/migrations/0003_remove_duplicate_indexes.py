@@ -0,0 +1,29 @@
+# Generated by Django 5.2.10 on 2026-10-15 10:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0002_gigradarproposal_raw_data_blob'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='gigradarproposal',
+            name='integration_proposa_caefd8_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='gigradarproposal',
+            name='integration_opportu_1e573d_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='gigradarproposal',
+            name='integration_job_id_b59f03_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='gigradarproposal',
+            name='integration_client__8643b0_idx',
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.10 on 2026-10-15 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0003_remove_duplicate_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='gigradarproposal',
+            name='integration_status_0f387b_idx',
+        ),
+        migrations.AddIndex(
+            model_name='gigradarproposal',
+            index=models.Index(condition=models.Q(('has_error', True)), fields=['-created'], name='gp_errors_created_idx'),
+        ),
+    ]
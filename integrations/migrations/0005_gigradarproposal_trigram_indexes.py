@@ -0,0 +1,42 @@
+# Generated by Django 5.2.10 on 2026-10-15 11:30
+
+from django.db import migrations
+
+# Trigram індекси на колонки з search_fields адмінки (замінені expression індексами в 0009)
+TRIGRAM_INDEXES = (
+    ('gp_job_title_trgm', 'job_title'),
+    ('gp_client_name_trgm', 'client_name'),
+    ('gp_scanner_name_trgm', 'scanner_name'),
+    ('gp_client_company_trgm', 'client_company'),
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # GIN/pg_trgm є лише в PostgreSQL, на SQLite (розробка) пропускаємо
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = schema_editor.quote_name(apps.get_model('integrations', 'GigradarProposal')._meta.db_table)
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {schema_editor.quote_name(name)} '
+            f'ON {table} USING gin ({schema_editor.quote_name(column)} gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {schema_editor.quote_name(name)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0004_gp_errors_created_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.10 on 2026-10-15 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def move_to_payload(apps, schema_editor):
+    GigradarProposal = apps.get_model('integrations', 'GigradarProposal')
+    GigradarProposalPayload = apps.get_model('integrations', 'GigradarProposalPayload')
+    payloads = []
+    for proposal in GigradarProposal.objects.only('id', 'error_message', 'raw_data_blob').iterator():
+        payloads.append(GigradarProposalPayload(
+            proposal_id=proposal.pk,
+            error_message=proposal.error_message,
+            raw_data_blob=proposal.raw_data_blob,
+        ))
+        if len(payloads) >= 1000:
+            GigradarProposalPayload.objects.bulk_create(payloads)
+            payloads = []
+    GigradarProposalPayload.objects.bulk_create(payloads)
+
+
+def move_from_payload(apps, schema_editor):
+    GigradarProposal = apps.get_model('integrations', 'GigradarProposal')
+    GigradarProposalPayload = apps.get_model('integrations', 'GigradarProposalPayload')
+    for payload in GigradarProposalPayload.objects.iterator():
+        GigradarProposal.objects.filter(pk=payload.proposal_id).update(
+            error_message=payload.error_message,
+            raw_data_blob=payload.raw_data_blob,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0005_gigradarproposal_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GigradarProposalPayload',
+            fields=[
+                ('proposal', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='payload', serialize=False, to='integrations.gigradarproposal')),
+                ('error_message', models.TextField(blank=True, help_text='Повідомлення про помилку', null=True)),
+                ('raw_data_blob', models.BinaryField(default=b'', help_text='Повні дані з webhook у форматі JSON, стиснуті zlib')),
+            ],
+            options={
+                'verbose_name': 'Gigradar Proposal Payload',
+                'verbose_name_plural': 'Gigradar Proposal Payloads',
+            },
+        ),
+        migrations.RunPython(move_to_payload, move_from_payload),
+        migrations.RemoveField(
+            model_name='gigradarproposal',
+            name='error_message',
+        ),
+        migrations.RemoveField(
+            model_name='gigradarproposal',
+            name='raw_data_blob',
+        ),
+    ]
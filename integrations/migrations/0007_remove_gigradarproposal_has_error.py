@@ -0,0 +1,37 @@
+# Generated by Django 5.2.10 on 2026-10-15 13:00
+
+from django.db import migrations, models
+
+
+def error_code_from_has_error(apps, schema_editor):
+    GigradarProposal = apps.get_model('integrations', 'GigradarProposal')
+    GigradarProposal.objects.filter(error_code='').update(error_code=None)
+    GigradarProposal.objects.filter(has_error=True, error_code__isnull=True).update(error_code='unknown')
+
+
+def has_error_from_error_code(apps, schema_editor):
+    GigradarProposal = apps.get_model('integrations', 'GigradarProposal')
+    GigradarProposal.objects.filter(error_code__isnull=False).update(has_error=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0006_gigradarproposalpayload'),
+    ]
+
+    operations = [
+        migrations.RunPython(error_code_from_has_error, has_error_from_error_code),
+        migrations.RemoveIndex(
+            model_name='gigradarproposal',
+            name='gp_errors_created_idx',
+        ),
+        migrations.RemoveField(
+            model_name='gigradarproposal',
+            name='has_error',
+        ),
+        migrations.AddIndex(
+            model_name='gigradarproposal',
+            index=models.Index(condition=models.Q(('error_code__isnull', False)), fields=['-created'], name='gp_errors_created_idx'),
+        ),
+    ]
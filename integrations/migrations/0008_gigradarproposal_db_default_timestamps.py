@@ -0,0 +1,49 @@
+# Generated by Django 5.2.10 on 2026-10-15 14:00
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+def create_updated_trigger(apps, schema_editor):
+    # Тригери встановлюються лише в PostgreSQL, на SQLite (розробка) пропускаємо
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = schema_editor.quote_name(apps.get_model('integrations', 'GigradarProposal')._meta.db_table)
+    schema_editor.execute(
+        'CREATE OR REPLACE FUNCTION gp_set_updated() RETURNS trigger AS $$ '
+        'BEGIN NEW.updated = now(); RETURN NEW; END; '
+        '$$ LANGUAGE plpgsql'
+    )
+    schema_editor.execute(
+        f'CREATE TRIGGER gp_set_updated BEFORE UPDATE ON {table} '
+        'FOR EACH ROW EXECUTE FUNCTION gp_set_updated()'
+    )
+
+
+def drop_updated_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = schema_editor.quote_name(apps.get_model('integrations', 'GigradarProposal')._meta.db_table)
+    schema_editor.execute(f'DROP TRIGGER IF EXISTS gp_set_updated ON {table}')
+    schema_editor.execute('DROP FUNCTION IF EXISTS gp_set_updated()')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0007_remove_gigradarproposal_has_error'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gigradarproposal',
+            name='created',
+            field=models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), help_text='Дата створення запису в БД'),
+        ),
+        migrations.AlterField(
+            model_name='gigradarproposal',
+            name='updated',
+            field=models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), help_text='Дата останнього оновлення'),
+        ),
+        migrations.RunPython(create_updated_trigger, drop_updated_trigger),
+    ]
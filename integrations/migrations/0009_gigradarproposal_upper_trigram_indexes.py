@@ -0,0 +1,64 @@
+# Generated by Django 5.2.10 on 2026-10-16 10:00
+
+from django.db import migrations
+
+# Індекси з 0005 на "голі" колонки: пошук адмінки їх не використовує
+OLD_TRIGRAM_INDEXES = (
+    ('gp_job_title_trgm', 'job_title'),
+    ('gp_client_name_trgm', 'client_name'),
+    ('gp_scanner_name_trgm', 'scanner_name'),
+    ('gp_client_company_trgm', 'client_company'),
+)
+
+# Пошук адмінки (icontains) генерує UPPER("col"::text) LIKE UPPER('%term%'),
+# тому індекси будуються на той самий вираз для кожної колонки з search_fields
+UPPER_TRIGRAM_INDEXES = (
+    ('gp_proposal_id_upper_trgm', 'proposal_id'),
+    ('gp_opportunity_id_upper_trgm', 'opportunity_id'),
+    ('gp_job_id_upper_trgm', 'job_id'),
+    ('gp_job_title_upper_trgm', 'job_title'),
+    ('gp_client_email_upper_trgm', 'client_email'),
+    ('gp_client_name_upper_trgm', 'client_name'),
+    ('gp_scanner_name_upper_trgm', 'scanner_name'),
+)
+
+
+def _create_indexes(schema_editor, table, indexes, expression):
+    for name, column in indexes:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {schema_editor.quote_name(name)} '
+            f'ON {table} USING gin ({expression.format(schema_editor.quote_name(column))} gin_trgm_ops)'
+        )
+
+
+def _drop_indexes(schema_editor, indexes):
+    for name, column in indexes:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {schema_editor.quote_name(name)}')
+
+
+def replace_with_upper_indexes(apps, schema_editor):
+    # GIN/pg_trgm є лише в PostgreSQL, на SQLite (розробка) пропускаємо
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = schema_editor.quote_name(apps.get_model('integrations', 'GigradarProposal')._meta.db_table)
+    _drop_indexes(schema_editor, OLD_TRIGRAM_INDEXES)
+    _create_indexes(schema_editor, table, UPPER_TRIGRAM_INDEXES, 'UPPER({}::text)')
+
+
+def restore_column_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = schema_editor.quote_name(apps.get_model('integrations', 'GigradarProposal')._meta.db_table)
+    _drop_indexes(schema_editor, UPPER_TRIGRAM_INDEXES)
+    _create_indexes(schema_editor, table, OLD_TRIGRAM_INDEXES, '{}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0008_gigradarproposal_db_default_timestamps'),
+    ]
+
+    operations = [
+        migrations.RunPython(replace_with_upper_indexes, restore_column_indexes),
+    ]
@@ -1,6 +1,28 @@
-from django.db import models
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import models, transaction
+from django.db.models.functions import Now
 from django.utils import timezone
-import json
+from integrations._parse import parse_proposal_data
+import orjson
+import zlib
+
+
+# Поля, які перезаписуються при повторному webhook для того ж proposal
+WEBHOOK_UPDATE_FIELDS = [
+    'opportunity_id', 'job_id',
+    'sent_at', 'scheduled_at', 'created_at',
+    'error_code',
+    'scanner_id', 'scanner_name', 'team_id', 'team_name',
+    'job_title', 'job_budget', 'job_type',
+    'client_email', 'client_name', 'client_company',
+    'updated',
+]
+
+# Поля GigradarProposalPayload, які перезаписуються при повторному webhook
+PAYLOAD_UPDATE_FIELDS = ['error_message', 'raw_data_blob']
+
+# Рівень zlib для raw_data: майже такий же розмір, як на 9, але значно швидше
+RAW_DATA_COMPRESSION_LEVEL = 3
 
 
 class GigradarProposal(models.Model):
@@ -18,10 +40,8 @@ class GigradarProposal(models.Model):
     scheduled_at = models.DateTimeField(null=True, blank=True, help_text="Запланована дата відправки")
     created_at = models.DateTimeField(null=True, blank=True, help_text="Дата створення в Gigradar")
     
-    # Помилки
-    has_error = models.BooleanField(default=False, help_text="Чи є помилка при відправці")
+    # Помилки (proposal з помилкою - це proposal з error_code)
     error_code = models.CharField(max_length=100, null=True, blank=True, help_text="Код помилки")
-    error_message = models.TextField(null=True, blank=True, help_text="Повідомлення про помилку")
     
     # Додаткова інформація
     scanner_id = models.CharField(max_length=255, null=True, blank=True, help_text="ID scanner")
@@ -43,115 +63,175 @@ class GigradarProposal(models.Model):
     hubspot_contact_id = models.CharField(max_length=255, null=True, blank=True, db_index=True, help_text="ID контакту в HubSpot")
     hubspot_deal_id = models.CharField(max_length=255, null=True, blank=True, db_index=True, help_text="ID deal в HubSpot")
     
-    # Повні дані з webhook (JSON)
-    raw_data = models.JSONField(default=dict, help_text="Повні дані з webhook у форматі JSON")
+    # Повні дані з webhook та текст помилки зберігаються в GigradarProposalPayload
     
-    # Метадані
-    created = models.DateTimeField(auto_now_add=True, help_text="Дата створення запису в БД")
-    updated = models.DateTimeField(auto_now=True, help_text="Дата останнього оновлення")
+    # Метадані (заповнюються в БД: DEFAULT now(), updated при UPDATE - тригером в PostgreSQL)
+    created = models.DateTimeField(db_default=Now(), help_text="Дата створення запису в БД")
+    updated = models.DateTimeField(db_default=Now(), help_text="Дата останнього оновлення")
     
     class Meta:
         verbose_name = "Gigradar Proposal"
         verbose_name_plural = "Gigradar Proposals"
         ordering = ['-created']
+        # proposal_id, opportunity_id, job_id, client_email вже індексовані через unique/db_index
         indexes = [
-            models.Index(fields=['proposal_id']),
-            models.Index(fields=['opportunity_id']),
-            models.Index(fields=['job_id']),
-            models.Index(fields=['client_email']),
             models.Index(fields=['-created']),
-            models.Index(fields=['status']),
+            # Proposal з помилками - рідкісні, тому частковий індекс
+            models.Index(
+                fields=['-created'],
+                condition=models.Q(error_code__isnull=False),
+                name='gp_errors_created_idx',
+            ),
         ]
     
     def __str__(self):
         return f"Proposal {self.proposal_id} - {self.job_title or 'N/A'}"
     
+    @property
+    def has_error(self) -> bool:
+        """Чи є помилка при відправці"""
+        return bool(self.error_code)
+    
+    def _get_payload(self):
+        """Повертає GigradarProposalPayload або None, якщо його ще немає"""
+        try:
+            return self.payload
+        except ObjectDoesNotExist:
+            return None
+    
+    @property
+    def raw_data(self) -> dict:
+        """Повні дані з webhook"""
+        payload = self._get_payload()
+        return payload.raw_data if payload else {}
+    
+    @property
+    def error_message(self):
+        """Повідомлення про помилку"""
+        payload = self._get_payload()
+        return payload.error_message if payload else None
+    
     @classmethod
-    def create_from_webhook_data(cls, data: dict) -> 'GigradarProposal':
+    def build_from_webhook_data(cls, data: dict) -> 'GigradarProposal':
         """
-        Створює або оновлює proposal з даних webhook
+        Будує незбережений proposal з даних webhook (без звернень до БД)
         
         Args:
             data: Дані з webhook події GIGRADAR.PROPOSAL.UPDATE
         
         Returns:
-            GigradarProposal instance
+            Незбережений GigradarProposal instance
         """
-        # Витягуємо основні дані
-        proposal_id = data.get('id') or data.get('proposalId') or data.get('_id')
-        if not proposal_id:
-            raise ValueError("Proposal ID не знайдено в даних")
+        fields, error_message = parse_proposal_data(data)
+        proposal = cls(**fields)
         
-        # Отримуємо або створюємо proposal
-        proposal, created = cls.objects.get_or_create(
-            proposal_id=proposal_id,
-            defaults={}
+        # Зберігаємо повні дані та текст помилки окремо від основного рядка
+        proposal.payload = GigradarProposalPayload(
+            error_message=error_message,
+            raw_data=data,
         )
         
-        # Оновлюємо поля
-        proposal.opportunity_id = data.get('opportunityId') or data.get('opportunity_id') or ''
-        proposal.job_id = data.get('jobId') or data.get('job_id') or ''
-        
-        # Статуси та дати
-        if 'sent' in data:
-            try:
-                from django.utils.dateparse import parse_datetime
-                proposal.sent_at = parse_datetime(data['sent']) if isinstance(data['sent'], str) else data['sent']
-            except:
-                pass
-        
-        if 'scheduledAt' in data:
-            try:
-                from django.utils.dateparse import parse_datetime
-                proposal.scheduled_at = parse_datetime(data['scheduledAt']) if isinstance(data['scheduledAt'], str) else data['scheduledAt']
-            except:
-                pass
+        return proposal
+    
+    @classmethod
+    def upsert_many(cls, proposals: list) -> list:
+        """
+        Зберігає пачку proposal та їх payload двома INSERT ... ON CONFLICT запитами
         
-        if 'createdAt' in data or 'created_at' in data:
-            try:
-                from django.utils.dateparse import parse_datetime
-                created_date = data.get('createdAt') or data.get('created_at')
-                proposal.created_at = parse_datetime(created_date) if isinstance(created_date, str) else created_date
-            except:
-                pass
+        Args:
+            proposals: Незбережені GigradarProposal instances з build_from_webhook_data
         
-        # Помилки
-        proposal.has_error = data.get('error', False) or data.get('hasError', False)
-        proposal.error_code = data.get('errorCode') or data.get('error_code')
-        proposal.error_message = data.get('errorMessage') or data.get('error_message')
+        Returns:
+            Список збережених proposal
+        """
+        # Gigradar може надіслати кілька оновлень одного proposal в межах пачки.
+        # Лишаємо останнє, бо ON CONFLICT не може оновити один рядок двічі
+        unique = list({proposal.proposal_id: proposal for proposal in proposals}.values())
         
-        # Scanner та team
-        proposal.scanner_id = data.get('scannerId') or data.get('scanner_id')
-        proposal.scanner_name = data.get('scannerName') or data.get('scanner_name')
-        proposal.team_id = data.get('teamId') or data.get('team_id')
-        proposal.team_name = data.get('teamName') or data.get('team_name')
+        try:
+            with transaction.atomic():
+                saved = cls.objects.bulk_create(
+                    unique,
+                    update_conflicts=True,
+                    unique_fields=['proposal_id'],
+                    update_fields=WEBHOOK_UPDATE_FIELDS,
+                )
+                
+                # Не всі бекенди повертають id з INSERT ... ON CONFLICT
+                if any(proposal.pk is None for proposal in saved):
+                    ids = dict(
+                        cls.objects.filter(proposal_id__in=[proposal.proposal_id for proposal in saved])
+                        .values_list('proposal_id', 'pk')
+                    )
+                    for proposal in saved:
+                        proposal.pk = ids[proposal.proposal_id]
+                
+                payloads = []
+                for proposal in saved:
+                    payload = proposal.payload
+                    payload.proposal = proposal
+                    payloads.append(payload)
+                GigradarProposalPayload.objects.bulk_create(
+                    payloads,
+                    update_conflicts=True,
+                    unique_fields=['proposal'],
+                    update_fields=PAYLOAD_UPDATE_FIELDS,
+                )
+        except Exception:
+            # Транзакцію відкочено - id, отримані з INSERT, більше не дійсні
+            for proposal in unique:
+                proposal.pk = None
+                proposal._state.adding = True
+            raise
         
-        # Дані про job
-        job = data.get('job', {})
-        if isinstance(job, dict):
-            proposal.job_title = job.get('title') or job.get('jobTitle')
-            budget = job.get('budget') or job.get('hourlyRate') or job.get('fixedPrice')
-            if budget:
-                try:
-                    proposal.job_budget = float(budget)
-                except:
-                    pass
-            proposal.job_type = job.get('type') or job.get('jobType')
-            
-            # Дані про клієнта
-            client = job.get('client', {})
-            if isinstance(client, dict):
-                proposal.client_email = client.get('email')
-                proposal.client_name = client.get('name')
-                proposal.client_company = client.get('company')
-            else:
-                # Якщо client - це просто рядок
-                proposal.client_email = job.get('clientEmail')
-                proposal.client_name = job.get('clientName')
-                proposal.client_company = job.get('companyName')
+        return saved
+    
+    @classmethod
+    def create_from_webhook_data(cls, data: dict) -> 'GigradarProposal':
+        """
+        Створює або оновлює proposal з даних webhook
         
-        # Зберігаємо повні дані
-        proposal.raw_data = data
+        Args:
+            data: Дані з webhook події GIGRADAR.PROPOSAL.UPDATE
         
-        proposal.save()
+        Returns:
+            GigradarProposal instance
+        """
+        proposal = cls.build_from_webhook_data(data)
+        cls.upsert_many([proposal])
         return proposal
+
+
+class GigradarProposalPayload(models.Model):
+    """
+    Рідко потрібні дані proposal: повний webhook та текст помилки.
+    Винесені з GigradarProposal, щоб не збільшувати основний рядок
+    """
+    proposal = models.OneToOneField(
+        GigradarProposal,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='payload',
+    )
+    error_message = models.TextField(null=True, blank=True, help_text="Повідомлення про помилку")
+    
+    # Повні дані з webhook (стиснутий JSON, доступ через raw_data)
+    raw_data_blob = models.BinaryField(default=b'', help_text="Повні дані з webhook у форматі JSON, стиснуті zlib")
+    
+    class Meta:
+        verbose_name = "Gigradar Proposal Payload"
+        verbose_name_plural = "Gigradar Proposal Payloads"
+    
+    def __str__(self):
+        return f"Payload {self.proposal_id}"
+    
+    @property
+    def raw_data(self) -> dict:
+        """Повні дані з webhook, розпаковані з raw_data_blob"""
+        if not self.raw_data_blob:
+            return {}
+        return orjson.loads(zlib.decompress(self.raw_data_blob))
+    
+    @raw_data.setter
+    def raw_data(self, value: dict):
+        self.raw_data_blob = zlib.compress(orjson.dumps(value), RAW_DATA_COMPRESSION_LEVEL)
@@ -0,0 +1,25 @@
+"""
+Спільне підключення до Redis
+"""
+import threading
+import redis
+from django.conf import settings
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_redis() -> redis.Redis:
+    """Повертає спільний Redis клієнт (створюється при першому виклику)"""
+    global _client
+
+    if _client is None:
+        with _lock:
+            if _client is None:
+                # Короткі таймаути: Redis, що не відповідає, не повинен блокувати webhook
+                _client = redis.Redis.from_url(
+                    settings.REDIS_URL,
+                    socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                )
+    return _client
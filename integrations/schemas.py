@@ -0,0 +1,68 @@
+"""
+Схеми msgspec для даних webhook Gigradar
+
+Винесені окремо від _parse.py: класи msgspec.Struct не компілюються mypyc
+"""
+import logging
+from typing import Any, Optional, Union
+import msgspec
+
+logger = logging.getLogger(__name__)
+
+
+class GigradarClient(msgspec.Struct):
+    """Клієнт job з webhook Gigradar"""
+    email: Optional[str] = None
+    name: Optional[str] = None
+    company: Optional[str] = None
+
+
+class GigradarJob(msgspec.Struct, rename='camel'):
+    """Job з webhook Gigradar (ключі у camelCase: jobTitle, hourlyRate, ...)"""
+    title: Optional[str] = None
+    job_title: Optional[str] = None
+    type: Optional[str] = None
+    job_type: Optional[str] = None
+    description: Optional[str] = None
+    budget: Union[str, float, None] = None
+    hourly_rate: Union[str, float, None] = None
+    fixed_price: Union[str, float, None] = None
+    # client - об'єкт або будь-що інше (рядок, id); в другому випадку дані клієнта лежать прямо в job
+    client: Any = None
+    client_email: Optional[str] = None
+    client_name: Optional[str] = None
+    company_name: Optional[str] = None
+
+
+def parse_job(job: Any) -> Optional[GigradarJob]:
+    """
+    Перевіряє типи полів job з webhook та перетворює його одним викликом msgspec
+    
+    strict=False дозволяє числа, передані рядками
+    
+    Returns:
+        GigradarJob або None, якщо job відсутній чи має невідомий формат
+    """
+    if job is None:
+        return None
+    try:
+        return msgspec.convert(job, GigradarJob, strict=False)
+    except msgspec.ValidationError as e:
+        logger.warning(f"Job з невірними даними пропущено: {e}")
+        return None
+
+
+def job_client(job: GigradarJob) -> Optional[GigradarClient]:
+    """
+    Повертає клієнта job, якщо client переданий об'єктом
+    
+    Returns:
+        GigradarClient або None, якщо client має інший формат
+    """
+    if not isinstance(job.client, dict):
+        return None
+    try:
+        return msgspec.convert(job.client, GigradarClient, strict=False)
+    except msgspec.ValidationError as e:
+        logger.warning(f"Client з невірними даними пропущено: {e}")
+        return None
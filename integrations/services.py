@@ -2,16 +2,56 @@
 Сервіси для інтеграції з HubSpot API
 """
 import logging
-from typing import Dict, Optional, Any
+import threading
+from typing import Dict, List, Optional, Any
 from hubspot import HubSpot
-from hubspot.crm.contacts import SimplePublicObjectInputForCreate
-from hubspot.crm.deals import SimplePublicObjectInputForCreate as DealInputForCreate
+from hubspot.crm.contacts import (
+    SimplePublicObjectInputForCreate,
+    SimplePublicObjectId,
+    BatchReadInputSimplePublicObjectId,
+    SimplePublicObjectBatchInputUpsert,
+    BatchInputSimplePublicObjectBatchInputUpsert,
+)
+from hubspot.crm.deals import (
+    SimplePublicObjectInputForCreate as DealInputForCreate,
+    BatchInputSimplePublicObjectInputForCreate as DealBatchInputForCreate,
+)
 from hubspot.crm.contacts.exceptions import ApiException as ContactApiException
 from hubspot.crm.deals.exceptions import ApiException as DealApiException
+from integrations.schemas import GigradarClient, GigradarJob, job_client, parse_job
 import os
 
 logger = logging.getLogger(__name__)
 
+# Максимальна кількість об'єктів в одному запиті до batch API HubSpot
+HUBSPOT_BATCH_LIMIT = 100
+
+
+def _is_retryable(error) -> bool:
+    """429 та 5xx (або відповідь без статусу) - тимчасові помилки HubSpot"""
+    return error.status is None or error.status == 429 or error.status >= 500
+
+
+class HubSpotRetryableError(Exception):
+    """
+    HubSpot тимчасово недоступний (429/5xx) посеред batch запиту
+    
+    Attributes:
+        sent: Словник ID об'єктів, які вже створено до помилки
+        pending: Об'єкти, які ще не надіслано
+    """
+    
+    def __init__(self, message: str, sent: Optional[Dict[str, str]] = None, pending: Optional[list] = None):
+        super().__init__(message)
+        self.sent = sent or {}
+        self.pending = pending or []
+
+
+def _chunks(items: list, size: int = HUBSPOT_BATCH_LIMIT):
+    """Розбиває список на частини для batch API"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
 
 class HubSpotService:
     """Сервіс для роботи з HubSpot API"""
@@ -79,32 +119,65 @@ class HubSpotService:
     
     def _find_contact_by_email(self, email: str) -> Optional[str]:
         """Знаходить контакт за email"""
-        try:
-            from hubspot.crm.contacts import PublicObjectSearchRequest
-            
-            # Використовуємо search API для пошуку контакту
-            search_request = PublicObjectSearchRequest(
-                filter_groups=[{
-                    "filters": [{
-                        "propertyName": "email",
-                        "operator": "EQ",
-                        "value": email
-                    }]
-                }],
-                properties=["email"],
-                limit=1
-            )
-            
-            search_result = self.client.crm.contacts.search_api.do_search(
-                public_object_search_request=search_request
-            )
-            
-            if search_result.results:
-                return search_result.results[0].id
-            return None
-        except Exception as e:
-            logger.error(f"Помилка пошуку контакту: {e}")
-            return None
+        return self.find_contacts_by_email([email]).get(email.lower())
+    
+    def find_contacts_by_email(self, emails: List[str]) -> Dict[str, str]:
+        """
+        Знаходить контакти за email через batch read API
+        
+        Args:
+            emails: Список email
+        
+        Returns:
+            Словник email (в нижньому регістрі) -> ID контакту
+        """
+        contact_ids = {}
+        for chunk in _chunks(list(dict.fromkeys(emails))):
+            try:
+                read_request = BatchReadInputSimplePublicObjectId(
+                    id_property="email",
+                    inputs=[SimplePublicObjectId(id=email) for email in chunk],
+                    properties=["email"],
+                    properties_with_history=[],
+                )
+                response = self.client.crm.contacts.batch_api.read(
+                    batch_read_input_simple_public_object_id=read_request
+                )
+                for contact in response.results:
+                    contact_ids[contact.properties["email"].lower()] = contact.id
+            except Exception as e:
+                logger.error(f"Помилка пошуку контактів: {e}")
+        return contact_ids
+    
+    def upsert_contacts(self, contacts: List[Dict[str, str]]) -> Dict[str, str]:
+        """
+        Створює або оновлює контакти в HubSpot через batch upsert API (ключ - email)
+        
+        Args:
+            contacts: Список властивостей контактів, кожен з обов'язковим "email"
+        
+        Returns:
+            Словник email (в нижньому регістрі) -> ID контакту
+        """
+        return self._run_batch(contacts, self._upsert_contacts_chunk, ContactApiException, "upsert контактів")
+    
+    def _upsert_contacts_chunk(self, chunk: List[Dict[str, str]]) -> Dict[str, str]:
+        """Один batch upsert запит для контактів"""
+        upsert_input = BatchInputSimplePublicObjectBatchInputUpsert(
+            inputs=[
+                SimplePublicObjectBatchInputUpsert(
+                    id_property="email",
+                    id=properties["email"],
+                    properties=properties,
+                )
+                for properties in chunk
+            ]
+        )
+        response = self.client.crm.contacts.batch_api.upsert(
+            batch_input_simple_public_object_batch_input_upsert=upsert_input
+        )
+        logger.info(f"Контакти оновлено в HubSpot: {len(response.results)}")
+        return {contact.properties["email"].lower(): contact.id for contact in response.results}
     
     def create_deal(self, dealname: str, amount: Optional[str] = None,
                    closedate: Optional[str] = None, dealstage: str = "appointmentscheduled",
@@ -157,31 +230,227 @@ class HubSpotService:
             logger.error(f"Помилка створення deal в HubSpot: {e}")
             return None
     
+    def create_deals(self, deals: List[Dict[str, str]]) -> Dict[str, str]:
+        """
+        Створює deals в HubSpot через batch create API
+        
+        HubSpot не гарантує порядок результатів, тому кожен deal повинен
+        мати властивість gigradar_opportunity_id для зіставлення
+        
+        Args:
+            deals: Список властивостей deals
+        
+        Returns:
+            Словник gigradar_opportunity_id -> ID deal
+        """
+        return self._run_batch(deals, self._create_deals_chunk, DealApiException, "створення deals")
+    
+    def _create_deals_chunk(self, chunk: List[Dict[str, str]]) -> Dict[str, str]:
+        """Один batch create запит для deals"""
+        batch_input = DealBatchInputForCreate(
+            inputs=[DealInputForCreate(properties=properties) for properties in chunk]
+        )
+        response = self.client.crm.deals.batch_api.create(
+            batch_input_simple_public_object_input_for_create=batch_input
+        )
+        logger.info(f"Deals створено в HubSpot: {len(response.results)}")
+        return {deal.properties.get("gigradar_opportunity_id"): deal.id for deal in response.results}
+    
+    @staticmethod
+    def _run_batch(items: list, send_chunk, api_exception: type, action: str) -> Dict[str, str]:
+        """
+        Надсилає items частинами по HUBSPOT_BATCH_LIMIT
+        
+        Якщо HubSpot відхиляє частину з помилкою 4xx, об'єкти надсилаються
+        поштучно, щоб один невалідний об'єкт не зривав решту. На помилці 429/5xx
+        надсилання зупиняється з HubSpotRetryableError, в якій є ID вже
+        створених об'єктів та ще не надіслані об'єкти
+        
+        Args:
+            items: Об'єкти для batch запиту
+            send_chunk: Функція, що надсилає частину і повертає словник ID
+            api_exception: Клас ApiException відповідного API
+            action: Опис дії для логів
+        
+        Returns:
+            Об'єднаний словник ID з усіх успішних запитів
+        
+        Raises:
+            HubSpotRetryableError: HubSpot тимчасово недоступний
+        """
+        ids = {}
+        for start in range(0, len(items), HUBSPOT_BATCH_LIMIT):
+            chunk = items[start:start + HUBSPOT_BATCH_LIMIT]
+            try:
+                ids.update(send_chunk(chunk))
+                continue
+            except api_exception as e:
+                if _is_retryable(e):
+                    raise HubSpotRetryableError(str(e), ids, items[start:]) from e
+                if len(chunk) == 1:
+                    logger.error(f"Помилка {action} в HubSpot: {e}")
+                    continue
+                logger.warning(f"Помилка batch {action} в HubSpot, надсилаємо поштучно: {e}")
+            
+            for offset, item in enumerate(chunk):
+                try:
+                    ids.update(send_chunk([item]))
+                except api_exception as e:
+                    if _is_retryable(e):
+                        raise HubSpotRetryableError(str(e), ids, items[start + offset:]) from e
+                    logger.error(f"Помилка {action} в HubSpot: {e}")
+        return ids
+    
     def _associate_deal_to_contact(self, deal_id: str, contact_id: str):
         """Асоціює deal з контактом"""
+        self._associate_deals_to_contacts([(contact_id, deal_id)])
+    
+    def _associate_deals_to_contacts(self, pairs: List[tuple]):
+        """
+        Асоціює deals з контактами одним batch запитом
+        
+        Args:
+            pairs: Список пар (contact_id, deal_id)
+        """
+        from hubspot.crm.associations.v4 import BatchInputPublicAssociationMultiPost
+        
+        for chunk in _chunks(pairs):
+            try:
+                association_input = BatchInputPublicAssociationMultiPost(
+                    inputs=[{
+                        "from": {"id": contact_id},
+                        "to": {"id": deal_id},
+                        "types": [{
+                            "associationCategory": "HUBSPOT_DEFINED",
+                            "associationTypeId": 4  # CONTACT_TO_DEAL
+                        }]
+                    } for contact_id, deal_id in chunk]
+                )
+                
+                self.client.crm.associations.v4.batch_api.create(
+                    from_object_type="contacts",
+                    to_object_type="deals",
+                    batch_input_public_association_multi_post=association_input
+                )
+                
+                logger.info(f"Асоційовано deals з контактами: {len(chunk)}")
+            except Exception as e:
+                logger.error(f"Помилка асоціації deals з контактами: {e}")
+    
+    @staticmethod
+    def _contact_properties(job: GigradarJob) -> Dict[str, str]:
+        """Будує властивості контакту з даних job"""
+        client = job_client(job) or GigradarClient()
+        
+        client_email = client.email or job.client_email
+        if client_email:
+            properties = {"email": client_email}
+            firstname = client.name or job.client_name
+            company = client.company or job.company_name
+            if firstname:
+                properties["firstname"] = firstname
+            if company:
+                properties["company"] = company
+            return properties
+        
+        # Якщо немає email, створюємо контакт з назвою компанії
+        company_name = client.company or job.company_name or "Unknown Company"
+        # Для HubSpot потрібен email, тому використовуємо заглушку
+        return {
+            "email": f"{company_name.lower().replace(' ', '_')}@gigradar.placeholder",
+            "company": company_name,
+        }
+    
+    @staticmethod
+    def _deal_properties(opportunity_data: Dict[str, Any], job: GigradarJob) -> Dict[str, str]:
+        """Будує властивості deal з даних opportunity"""
+        budget = job.budget or job.hourly_rate
+        
+        properties = {
+            "dealname": f"GigRadar Opportunity: {job.title or 'Untitled Job'}",
+            "dealstage": "appointmentscheduled",
+            "pipeline": "default",
+            # Додаткові поля
+            "gigradar_opportunity_id": opportunity_data.get("id", ""),
+            "gigradar_job_id": opportunity_data.get("jobId", ""),
+            "job_title": job.title or "",
+            "job_description": (job.description or "")[:500],  # Обмежуємо довжину
+        }
+        if budget:
+            properties["amount"] = str(budget)
+        return properties
+    
+    def process_gigradar_opportunities(self, opportunities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Обробляє пачку opportunity з Gigradar через batch API HubSpot:
+        один запит на контакти, один на deals і один на асоціації (на кожні 100 об'єктів)
+        
+        Args:
+            opportunities: Дані opportunity з webhook Gigradar
+        
+        Контакти створюються upsert, тому повторити їх безпечно: якщо HubSpot
+        недоступний на цьому кроці, HubSpotRetryableError пробрасується для всієї
+        пачки. Deals створюються не ідемпотентно, тому після помилки 429/5xx
+        на повтор позначаються ("retry") лише ще не створені deals
+        
+        Returns:
+            Список словників з результатами обробки (в порядку opportunities)
+        """
+        results = [
+            {"success": False, "retry": False, "contact_id": None, "deal_id": None, "errors": []}
+            for _ in opportunities
+        ]
+        
+        # Ключ контакту (email в нижньому регістрі) та властивості deal для кожної opportunity
+        email_keys = []
+        deals = []
+        unique_contacts = {}
+        for result, opportunity_data in zip(results, opportunities):
+            try:
+                job = parse_job(opportunity_data.get("job")) or GigradarJob()
+                contact = self._contact_properties(job)
+                contact["email"] = str(contact["email"])
+                email_key = contact["email"].lower()
+                deal = self._deal_properties(opportunity_data, job)
+            except Exception as e:
+                logger.error(f"Помилка обробки opportunity: {e}")
+                result["errors"].append(str(e))
+                email_key = deal = None
+            else:
+                # Створюємо один контакт на email
+                unique_contacts.setdefault(email_key, contact)
+            email_keys.append(email_key)
+            deals.append(deal)
+        
+        contact_ids = self.upsert_contacts(list(unique_contacts.values()))
+        
+        # Створюємо deals
+        pending = set()
         try:
-            from hubspot.crm.associations.v4 import BatchInputPublicAssociationMultiPost
-            
-            association_input = BatchInputPublicAssociationMultiPost(
-                inputs=[{
-                    "from": {"id": contact_id},
-                    "to": {"id": deal_id},
-                    "types": [{
-                        "associationCategory": "HUBSPOT_DEFINED",
-                        "associationTypeId": 4  # CONTACT_TO_DEAL
-                    }]
-                }]
-            )
-            
-            self.client.crm.associations.v4.batch_api.create(
-                from_object_type="contacts",
-                to_object_type="deals",
-                batch_input_public_association_multi_post=association_input
-            )
-            
-            logger.info(f"Deal {deal_id} асоційовано з контактом {contact_id}")
-        except Exception as e:
-            logger.error(f"Помилка асоціації deal з контактом: {e}")
+            deal_ids = self.create_deals([properties for properties in deals if properties])
+        except HubSpotRetryableError as e:
+            logger.warning(f"HubSpot недоступний, не створено deals: {len(e.pending)}: {e}")
+            deal_ids = e.sent
+            pending = {id(properties) for properties in e.pending}
+        
+        # Асоціюємо deals з контактами
+        pairs = []
+        for result, email_key, deal in zip(results, email_keys, deals):
+            if not deal:
+                continue
+            if id(deal) in pending:
+                result["retry"] = True
+                result["errors"].append("HubSpot тимчасово недоступний")
+                continue
+            result["contact_id"] = contact_ids.get(email_key)
+            result["deal_id"] = deal_ids.get(deal["gigradar_opportunity_id"])
+            result["success"] = bool(result["deal_id"])
+            if result["contact_id"] and result["deal_id"]:
+                pairs.append((result["contact_id"], result["deal_id"]))
+        if pairs:
+            self._associate_deals_to_contacts(list(dict.fromkeys(pairs)))
+        
+        return results
     
     def process_gigradar_opportunity(self, opportunity_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -193,59 +462,24 @@ class HubSpotService:
         Returns:
             Словник з результатами обробки
         """
-        result = {
-            "success": False,
-            "contact_id": None,
-            "deal_id": None,
-            "errors": []
-        }
-        
-        try:
-            # Витягуємо дані з opportunity
-            job = opportunity_data.get("job", {})
-            job_id = opportunity_data.get("jobId", "")
-            opportunity_id = opportunity_data.get("id", "")
-            
-            # Створюємо контакт (якщо є email клієнта)
-            client_email = job.get("client", {}).get("email") or job.get("clientEmail")
-            if client_email:
-                contact_id = self.create_contact(
-                    email=client_email,
-                    firstname=job.get("client", {}).get("name") or job.get("clientName"),
-                    company=job.get("client", {}).get("company") or job.get("companyName"),
-                )
-                result["contact_id"] = contact_id
-            else:
-                # Якщо немає email, створюємо контакт з назвою компанії
-                company_name = job.get("client", {}).get("company") or job.get("companyName") or "Unknown Company"
-                # Для HubSpot потрібен email, тому використовуємо заглушку
-                contact_id = self.create_contact(
-                    email=f"{company_name.lower().replace(' ', '_')}@gigradar.placeholder",
-                    company=company_name,
-                )
-                result["contact_id"] = contact_id
-            
-            # Створюємо deal
-            deal_name = f"GigRadar Opportunity: {job.get('title', 'Untitled Job')}"
-            budget = job.get("budget") or job.get("hourlyRate")
-            
-            deal_id = self.create_deal(
-                dealname=deal_name,
-                amount=str(budget) if budget else None,
-                dealstage="appointmentscheduled",
-                contact_id=contact_id,
-                # Додаткові поля
-                gigradar_opportunity_id=opportunity_id,
-                gigradar_job_id=job_id,
-                job_title=job.get("title", ""),
-                job_description=job.get("description", "")[:500],  # Обмежуємо довжину
-            )
-            
-            result["deal_id"] = deal_id
-            result["success"] = bool(deal_id)
-            
-        except Exception as e:
-            logger.error(f"Помилка обробки opportunity: {e}")
-            result["errors"].append(str(e))
-        
-        return result
+        return self.process_gigradar_opportunities([opportunity_data])[0]
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_hubspot_service() -> HubSpotService:
+    """
+    Повертає спільний HubSpotService для процесу
+    
+    Клієнт HubSpot тримає пули HTTPS з'єднань, тому один екземпляр
+    дозволяє перевикористовувати keep-alive з'єднання між задачами
+    """
+    global _service
+    
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = HubSpotService()
+    return _service
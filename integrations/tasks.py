@@ -0,0 +1,143 @@
+"""
+Celery задачі для інтеграції з HubSpot
+"""
+import logging
+import os
+from typing import Any, Dict, Optional
+import orjson
+from celery import shared_task
+from django.db import InterfaceError, OperationalError
+from integrations.batching import save_proposals
+from integrations.redis_client import get_redis
+from integrations.services import get_hubspot_service, HubSpotRetryableError, HUBSPOT_BATCH_LIMIT
+
+logger = logging.getLogger(__name__)
+
+# Redis список, в якому накопичуються opportunity до наступної пачки
+OPPORTUNITY_QUEUE_KEY = 'gigradar:opportunities'
+
+# Redis список proposal подій; пачка зберігається, коли набралось PROPOSAL_BATCH_SIZE
+# подій або за розкладом Celery beat (PROPOSAL_FLUSH_INTERVAL в settings)
+PROPOSAL_QUEUE_KEY = 'gigradar:proposals'
+PROPOSAL_BATCH_SIZE = int(os.getenv('PROPOSAL_BATCH_SIZE', '100'))
+
+
+def queue_opportunity(data: Dict[str, Any]) -> None:
+    """
+    Додає opportunity в чергу на пакетну обробку
+    
+    Черга обробляється flush_opportunities раз на хвилину (Celery beat)
+    або одразу, як тільки набереться повна пачка для batch API HubSpot
+    
+    Args:
+        data: Дані opportunity з webhook
+    """
+    queued = get_redis().rpush(OPPORTUNITY_QUEUE_KEY, orjson.dumps(data))
+    if queued == HUBSPOT_BATCH_LIMIT:
+        flush_opportunities.delay()
+
+
+@shared_task(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=5,
+)
+def flush_opportunities() -> int:
+    """
+    Обробляє накопичені opportunity пачками: створює контакти та deals в HubSpot
+    
+    Якщо HubSpot тимчасово недоступний (429/5xx), в чергу повертаються лише
+    opportunity, для яких ще не створено deal, а задача повторюється з backoff
+    
+    Returns:
+        Кількість оброблених opportunity
+    """
+    redis = get_redis()
+    processed = 0
+    
+    try:
+        # Ініціалізуємо HubSpot сервіс
+        hubspot_service = get_hubspot_service()
+    except ValueError as e:
+        # Помилка конфігурації (наприклад, відсутній токен) - opportunity лишаються в черзі
+        logger.error(f"Помилка конфігурації HubSpot: {e}")
+        return processed
+    
+    while True:
+        items = redis.lpop(OPPORTUNITY_QUEUE_KEY, HUBSPOT_BATCH_LIMIT)
+        if not items:
+            break
+        
+        try:
+            results = hubspot_service.process_gigradar_opportunities(
+                [orjson.loads(item) for item in items]
+            )
+        except Exception as e:
+            # Повертаємо пачку в чергу, щоб обробити її наступного разу
+            logger.error(f"Помилка обробки пачки opportunity: {e}", exc_info=True)
+            redis.rpush(OPPORTUNITY_QUEUE_KEY, *items)
+            raise
+        
+        retry = [item for item, result in zip(items, results) if result["retry"]]
+        failed = [result for result in results if not result["success"] and not result["retry"]]
+        logger.info(
+            f"Оброблено пачку opportunity: {len(results) - len(retry)}, з помилками: {len(failed)}"
+        )
+        for result in failed:
+            logger.warning(f"Помилка обробки opportunity: {result.get('errors', [])}")
+        processed += len(results) - len(retry)
+        
+        if retry:
+            # Створені deals не повторюємо - в чергу повертаються лише ще не надіслані
+            redis.rpush(OPPORTUNITY_QUEUE_KEY, *retry)
+            raise HubSpotRetryableError(f"HubSpot недоступний, повернуто в чергу opportunity: {len(retry)}")
+    
+    return processed
+
+
+def queue_proposal(data: Dict[str, Any], seen_key: Optional[str] = None) -> None:
+    """
+    Додає proposal подію в чергу на пакетне збереження
+    
+    Черга зберігається в Redis, тому події не губляться при перезапуску web процесу
+    
+    Args:
+        data: Дані proposal з webhook
+        seen_key: Ключ події для Bloom filter, запам'ятовується після збереження
+    """
+    queued = get_redis().rpush(PROPOSAL_QUEUE_KEY, orjson.dumps({"data": data, "seen_key": seen_key}))
+    if queued == PROPOSAL_BATCH_SIZE:
+        flush_proposals.delay()
+
+
+@shared_task(
+    autoretry_for=(OperationalError, InterfaceError),
+    retry_backoff=True,
+    max_retries=5,
+)
+def flush_proposals() -> int:
+    """
+    Зберігає накопичені proposal в БД пачками
+    
+    Якщо БД недоступна, пачка повертається на початок черги (щоб не змінити
+    порядок оновлень одного proposal), а задача повторюється з backoff
+    
+    Returns:
+        Кількість збережених proposal
+    """
+    redis = get_redis()
+    saved = 0
+    
+    while True:
+        items = redis.lpop(PROPOSAL_QUEUE_KEY, PROPOSAL_BATCH_SIZE)
+        if not items:
+            break
+        
+        try:
+            saved += save_proposals([orjson.loads(item) for item in items])
+        except (OperationalError, InterfaceError) as e:
+            logger.error(f"БД недоступна, пачку з {len(items)} proposal повернуто в чергу: {e}")
+            redis.lpush(PROPOSAL_QUEUE_KEY, *reversed(items))
+            raise
+    
+    return saved
@@ -1,3 +1,481 @@
-from django.test import TestCase
+import base64
+import ijson
+from datetime import datetime, timezone
+from unittest import mock
+import orjson
+from django.db import OperationalError
+from django.test import SimpleTestCase, TestCase
+from integrations import tasks, views
+from integrations._parse import UNKNOWN_ERROR_CODE, parse_proposal_data
+from integrations.models import GigradarProposal, GigradarProposalPayload
+from integrations.services import HubSpotRetryableError, HubSpotService
+from hubspot.crm.deals.exceptions import ApiException as DealApiException
 
-# Create your tests here.
+
+class ParseProposalDataTests(SimpleTestCase):
+    """Розбір даних proposal з webhook Gigradar"""
+    
+    def test_camel_case_keys(self):
+        fields, error_message = parse_proposal_data({
+            'id': 'p1',
+            'opportunityId': 'o1',
+            'jobId': 'j1',
+            'scannerName': 'Scanner',
+            'teamId': 't1',
+        })
+        self.assertEqual(fields['proposal_id'], 'p1')
+        self.assertEqual(fields['opportunity_id'], 'o1')
+        self.assertEqual(fields['job_id'], 'j1')
+        self.assertEqual(fields['scanner_name'], 'Scanner')
+        self.assertEqual(fields['team_id'], 't1')
+        self.assertIsNone(fields['error_code'])
+        self.assertIsNone(error_message)
+    
+    def test_alternate_keys(self):
+        for id_key in ('proposalId', '_id'):
+            with self.subTest(id_key=id_key):
+                fields, _ = parse_proposal_data({
+                    id_key: 'p1',
+                    'opportunity_id': 'o1',
+                    'job_id': 'j1',
+                    'scanner_id': 's1',
+                    'error_code': 'E1',
+                    'error_message': 'boom',
+                })
+                self.assertEqual(fields['proposal_id'], 'p1')
+                self.assertEqual(fields['opportunity_id'], 'o1')
+                self.assertEqual(fields['job_id'], 'j1')
+                self.assertEqual(fields['scanner_id'], 's1')
+                self.assertEqual(fields['error_code'], 'E1')
+    
+    def test_missing_ids_default_to_empty(self):
+        fields, _ = parse_proposal_data({'id': 'p1'})
+        self.assertEqual(fields['opportunity_id'], '')
+        self.assertEqual(fields['job_id'], '')
+        self.assertNotIn('job_title', fields)
+    
+    def test_missing_proposal_id(self):
+        with self.assertRaises(ValueError):
+            parse_proposal_data({'opportunityId': 'o1'})
+    
+    def test_error_flag_without_code(self):
+        fields, error_message = parse_proposal_data({'id': 'p1', 'hasError': True, 'errorMessage': 'boom'})
+        self.assertEqual(fields['error_code'], UNKNOWN_ERROR_CODE)
+        self.assertEqual(error_message, 'boom')
+    
+    def test_dates(self):
+        fields, _ = parse_proposal_data({
+            'id': 'p1',
+            'sent': '2024-01-02T03:04:05Z',
+            'scheduledAt': 'not a date',
+            'created_at': '2024-13-45T00:00:00Z',
+        })
+        self.assertEqual(fields['sent_at'], datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc))
+        self.assertIsNone(fields['scheduled_at'])
+        self.assertIsNone(fields['created_at'])
+    
+    def test_job_fields(self):
+        fields, _ = parse_proposal_data({
+            'id': 'p1',
+            'job': {'jobTitle': 'Django dev', 'jobType': 'hourly', 'hourlyRate': '45.5'},
+        })
+        self.assertEqual(fields['job_title'], 'Django dev')
+        self.assertEqual(fields['job_type'], 'hourly')
+        self.assertEqual(fields['job_budget'], 45.5)
+    
+    def test_invalid_budget_is_skipped(self):
+        fields, _ = parse_proposal_data({'id': 'p1', 'job': {'title': 'Dev', 'budget': 'n/a'}})
+        self.assertEqual(fields['job_title'], 'Dev')
+        self.assertNotIn('job_budget', fields)
+    
+    def test_client_object(self):
+        fields, _ = parse_proposal_data({
+            'id': 'p1',
+            'job': {
+                'client': {'email': 'a@example.com', 'name': 'Ann', 'company': 'Acme'},
+                'clientEmail': 'ignored@example.com',
+            },
+        })
+        self.assertEqual(fields['client_email'], 'a@example.com')
+        self.assertEqual(fields['client_name'], 'Ann')
+        self.assertEqual(fields['client_company'], 'Acme')
+    
+    def test_client_not_an_object(self):
+        for client in ('Ann', 42, ['Ann'], None):
+            with self.subTest(client=client):
+                fields, _ = parse_proposal_data({
+                    'id': 'p1',
+                    'job': {
+                        'title': 'Dev',
+                        'client': client,
+                        'clientEmail': 'a@example.com',
+                        'clientName': 'Ann',
+                        'companyName': 'Acme',
+                    },
+                })
+                self.assertEqual(fields['job_title'], 'Dev')
+                self.assertEqual(fields['client_email'], 'a@example.com')
+                self.assertEqual(fields['client_name'], 'Ann')
+                self.assertEqual(fields['client_company'], 'Acme')
+    
+    def test_job_of_unknown_shape_is_ignored(self):
+        for job in ('j1', {'title': 123}, {'budget': [1]}):
+            with self.subTest(job=job), self.assertLogs('integrations.schemas', level='WARNING'):
+                fields, _ = parse_proposal_data({'id': 'p1', 'job': job})
+            self.assertNotIn('job_title', fields)
+    
+    def test_numeric_budget(self):
+        for budget in (100, 99.5, '100'):
+            with self.subTest(budget=budget):
+                fields, _ = parse_proposal_data({'id': 'p1', 'job': {'fixedPrice': budget}})
+                self.assertEqual(fields['job_budget'], float(budget))
+    
+    def test_client_object_with_invalid_fields(self):
+        with self.assertLogs('integrations.schemas', level='WARNING'):
+            fields, _ = parse_proposal_data({
+                'id': 'p1',
+                'job': {'client': {'email': 12345}, 'clientEmail': 'a@example.com'},
+            })
+        self.assertEqual(fields['client_email'], 'a@example.com')
+
+
+class UpsertManyTests(TestCase):
+    """Збереження пачки proposal через INSERT ... ON CONFLICT"""
+    
+    def test_insert_and_conflict_update(self):
+        GigradarProposal.upsert_many([
+            GigradarProposal.build_from_webhook_data({'id': 'p1', 'jobId': 'j1', 'errorMessage': 'first'}),
+            GigradarProposal.build_from_webhook_data({'id': 'p2', 'jobId': 'j2'}),
+        ])
+        GigradarProposal.upsert_many([
+            GigradarProposal.build_from_webhook_data({'id': 'p1', 'jobId': 'j1-new', 'errorMessage': 'second'}),
+        ])
+        
+        self.assertEqual(GigradarProposal.objects.count(), 2)
+        self.assertEqual(GigradarProposalPayload.objects.count(), 2)
+        
+        proposal = GigradarProposal.objects.get(proposal_id='p1')
+        self.assertEqual(proposal.job_id, 'j1-new')
+        self.assertEqual(proposal.error_message, 'second')
+        self.assertEqual(proposal.raw_data['jobId'], 'j1-new')
+    
+    def test_duplicates_in_one_batch_keep_last(self):
+        GigradarProposal.upsert_many([
+            GigradarProposal.build_from_webhook_data({'id': 'p1', 'jobId': 'j1'}),
+            GigradarProposal.build_from_webhook_data({'id': 'p1', 'jobId': 'j2'}),
+        ])
+        
+        self.assertEqual(GigradarProposal.objects.get().job_id, 'j2')
+        self.assertEqual(GigradarProposalPayload.objects.count(), 1)
+
+
+@mock.patch('integrations.batching.mark_proposals_seen')
+class FlushProposalsTests(TestCase):
+    """Збереження черги proposal пачками"""
+    
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = mock.patch('integrations.tasks.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_bad_event_does_not_drop_batch(self, mark_proposals_seen):
+        for data, seen_key in (
+            ({'id': 'p1'}, 'k1'),
+            ({'id': 'p2', 'sent': 12345}, 'k2'),
+            ({'id': 'p3'}, 'k3'),
+        ):
+            tasks.queue_proposal(data, seen_key)
+        
+        with self.assertLogs('integrations.batching', level='WARNING'):
+            saved = tasks.flush_proposals()
+        
+        self.assertEqual(saved, 2)
+        self.assertEqual(
+            sorted(GigradarProposal.objects.values_list('proposal_id', flat=True)),
+            ['p1', 'p3'],
+        )
+        self.assertEqual(self.redis.lists[tasks.PROPOSAL_QUEUE_KEY], [])
+        mark_proposals_seen.assert_called_once_with(['k1', 'k3'])
+    
+    def test_unavailable_db_keeps_queue_order(self, mark_proposals_seen):
+        tasks.queue_proposal({'id': 'p1'}, 'k1')
+        tasks.queue_proposal({'id': 'p2'}, 'k2')
+        tasks.queue_proposal({'id': 'p3'}, 'k3')
+        queued = list(self.redis.lists[tasks.PROPOSAL_QUEUE_KEY])
+        
+        with mock.patch.object(GigradarProposal, 'upsert_many', side_effect=OperationalError('db down')), \
+                mock.patch.object(tasks, 'PROPOSAL_BATCH_SIZE', 2), \
+                self.assertLogs('integrations.tasks', level='ERROR'), \
+                self.assertRaises(OperationalError):
+            tasks.flush_proposals()
+        
+        # Пачка p1, p2 повернута перед p3
+        self.assertEqual(self.redis.lists[tasks.PROPOSAL_QUEUE_KEY], queued)
+        mark_proposals_seen.assert_not_called()
+
+
+class PeekEventTypeTests(SimpleTestCase):
+    """Попередній перегляд типу події в тілі webhook"""
+    
+    def test_event_first(self):
+        body = b'{"event": "GIGRADAR.PROPOSAL.UPDATE", "data": {"id": "p1"}}'
+        self.assertEqual(views._peek_event_type(body), 'GIGRADAR.PROPOSAL.UPDATE')
+    
+    def test_event_after_data(self):
+        body = b'{"data": {"id": "p1"}, "event": "GIGRADAR.PROPOSAL.UPDATE"}'
+        self.assertIsNone(views._peek_event_type(body))
+    
+    def test_only_type(self):
+        self.assertIsNone(views._peek_event_type(b'{"type": "GIGRADAR.PROPOSAL.UPDATE", "id": "p1"}'))
+        self.assertIsNone(views._peek_event_type(b'{"event": "", "type": "GIGRADAR.PROPOSAL.UPDATE"}'))
+    
+    def test_event_beyond_peek_limit(self):
+        keys = ', '.join(f'"k{index}": {index}' for index in range(views._PEEK_MAX_EVENTS))
+        body = ('{' + keys + ', "event": "GIGRADAR.PROPOSAL.UPDATE"}').encode()
+        self.assertIsNone(views._peek_event_type(body))
+    
+    def test_large_body(self):
+        body = b'{"event": "GIGRADAR.X", "data": {"description": "' + b'x' * 100_000 + b'"}}'
+        self.assertEqual(views._peek_event_type(body), 'GIGRADAR.X')
+    
+    def test_malformed_prefix(self):
+        for body in (
+            b'',
+            b'{"event": "GIG',
+            b'{"event": "GIGRADAR.X"',
+            b'{"event": "GIGRADAR.X", garbage',
+            b'{"event": "GIGRADAR.X", "data": {"id": 1, garbage',
+        ):
+            with self.subTest(body=body), self.assertRaises(ijson.JSONError):
+                views._peek_event_type(body)
+    
+    def test_malformed_tail_is_not_checked(self):
+        keys = ', '.join(f'"k{index}": {index}' for index in range(views._PEEK_MAX_EVENTS))
+        body = ('{"event": "GIGRADAR.X", "data": {' + keys + ', garbage').encode()
+        self.assertEqual(views._peek_event_type(body), 'GIGRADAR.X')
+
+
+@mock.patch.object(views, '_WEBHOOK_USERNAME', 'user')
+@mock.patch.object(views, '_WEBHOOK_PASSWORD', 'secret')
+class BasicAuthTests(SimpleTestCase):
+    """Перевірка Basic облікових даних webhook"""
+    
+    @staticmethod
+    def _header(credentials: str) -> str:
+        return 'Basic ' + base64.b64encode(credentials.encode()).decode()
+    
+    def test_valid_credentials(self):
+        self.assertTrue(views._is_valid_basic_auth(self._header('user:secret')))
+    
+    def test_wrong_credentials(self):
+        self.assertFalse(views._is_valid_basic_auth(self._header('user:wrong')))
+        self.assertFalse(views._is_valid_basic_auth(self._header('other:secret')))
+        self.assertFalse(views._is_valid_basic_auth(self._header('usersecret')))
+    
+    def test_malformed_header(self):
+        self.assertFalse(views._is_valid_basic_auth(''))
+        self.assertFalse(views._is_valid_basic_auth('Bearer token'))
+        self.assertFalse(views._is_valid_basic_auth('Basic %%%'))
+        self.assertFalse(views._is_valid_basic_auth('Basic ' + base64.b64encode(b'\xff:\xfe').decode()))
+
+
+@mock.patch.object(views, '_WEBHOOK_TOKEN', 'token')
+@mock.patch.object(views, '_WEBHOOK_USERNAME', None)
+@mock.patch.object(views, '_WEBHOOK_PASSWORD', None)
+class WebhookTokenTests(SimpleTestCase):
+    """Перевірка токена з URL webhook"""
+    
+    def _post(self, token: str, body: bytes = b'{"event": "GIGRADAR.UNKNOWN", "data": {}}'):
+        return self.client.post(f'/hooks/catch/{token}/', data=body, content_type='application/json')
+    
+    def test_wrong_token(self):
+        with self.assertLogs('integrations.views', level='WARNING'):
+            self.assertEqual(self._post('wrong').status_code, 401)
+    
+    def test_valid_token(self):
+        with self.assertLogs('integrations.views', level='WARNING'):
+            response = self._post('token')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'received')
+    
+    def test_malformed_body(self):
+        for body in (b'{"event": "GIGRADAR.UNKNOWN", garbage', b'{"type": "GIGRADAR.UNKNOWN", garbage'):
+            with self.subTest(body=body), self.assertLogs('integrations.views', level='ERROR'):
+                self.assertEqual(self._post('token', body).status_code, 400)
+
+
+class RunBatchTests(SimpleTestCase):
+    """Batch запити до HubSpot з поштучним повтором"""
+    
+    @staticmethod
+    def _send_chunk(status: int):
+        def send_chunk(chunk):
+            if len(chunk) > 1 or chunk[0] == 'bad':
+                raise DealApiException(status=status)
+            return {chunk[0]: f'id-{chunk[0]}'}
+        return send_chunk
+    
+    def test_client_error_falls_back_to_single_items(self):
+        with self.assertLogs('integrations.services', level='WARNING'):
+            ids = HubSpotService._run_batch(['a', 'bad', 'c'], self._send_chunk(400), DealApiException, 'test')
+        
+        self.assertEqual(ids, {'a': 'id-a', 'c': 'id-c'})
+    
+    def test_retryable_errors_propagate(self):
+        for status in (429, 500, 503):
+            with self.subTest(status=status), self.assertRaises(HubSpotRetryableError) as raised:
+                HubSpotService._run_batch(['a', 'b'], self._send_chunk(status), DealApiException, 'test')
+            self.assertEqual(raised.exception.sent, {})
+            self.assertEqual(raised.exception.pending, ['a', 'b'])
+    
+    def test_retryable_error_in_fallback_keeps_sent_ids(self):
+        def send_chunk(chunk):
+            if len(chunk) > 1:
+                raise DealApiException(status=400)
+            if chunk[0] == 'c':
+                raise DealApiException(status=503)
+            return {chunk[0]: f'id-{chunk[0]}'}
+        
+        with self.assertLogs('integrations.services', level='WARNING'), \
+                self.assertRaises(HubSpotRetryableError) as raised:
+            HubSpotService._run_batch(['a', 'b', 'c', 'd'], send_chunk, DealApiException, 'test')
+        
+        self.assertEqual(raised.exception.sent, {'a': 'id-a', 'b': 'id-b'})
+        self.assertEqual(raised.exception.pending, ['c', 'd'])
+
+
+def _fake_upsert_contacts(chunk):
+    return {properties["email"].lower(): f'c-{properties["email"].lower()}' for properties in chunk}
+
+
+def _fake_create_deals(chunk):
+    return {properties["gigradar_opportunity_id"]: f'd-{properties["gigradar_opportunity_id"]}' for properties in chunk}
+
+
+class FakeRedis:
+    """Мінімальний Redis список для тестів черги opportunity"""
+    
+    def __init__(self):
+        self.lists = {}
+    
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+        return len(self.lists[key])
+    
+    def lpush(self, key, *values):
+        self.lists[key] = list(reversed(values)) + self.lists.get(key, [])
+        return len(self.lists[key])
+    
+    def lpop(self, key, count):
+        items = self.lists.get(key, [])
+        popped, self.lists[key] = items[:count], items[count:]
+        return popped or None
+
+
+class ProcessOpportunitiesTests(SimpleTestCase):
+    """Пакетна обробка opportunity в HubSpot"""
+    
+    def setUp(self):
+        self.service = HubSpotService(access_token='test')
+        for name, side_effect in (
+            ('_upsert_contacts_chunk', _fake_upsert_contacts),
+            ('_create_deals_chunk', _fake_create_deals),
+            ('_associate_deals_to_contacts', None),
+        ):
+            patcher = mock.patch.object(self.service, name, side_effect=side_effect)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def test_batch(self):
+        results = self.service.process_gigradar_opportunities([
+            {'id': 'o1', 'job': {'title': 'Dev', 'client': {'email': 'A@example.com'}}},
+            {'id': 'o2', 'job': {'title': 'QA', 'clientEmail': 'a@example.com'}},
+        ])
+        
+        self.assertEqual([result['deal_id'] for result in results], ['d-o1', 'd-o2'])
+        self.assertEqual([result['contact_id'] for result in results], ['c-a@example.com'] * 2)
+        self.assertTrue(all(result['success'] for result in results))
+        # Один контакт на email
+        self.assertEqual(len(self.service._upsert_contacts_chunk.call_args.args[0]), 1)
+        self.service._associate_deals_to_contacts.assert_called_once_with(
+            [('c-a@example.com', 'd-o1'), ('c-a@example.com', 'd-o2')]
+        )
+    
+    def test_invalid_email_does_not_fail_batch(self):
+        with self.assertLogs('integrations.schemas', level='WARNING'):
+            results = self.service.process_gigradar_opportunities([
+                {'id': 'o1', 'job': {'client': {'email': 12345}}},
+                {'id': 'o2', 'job': {'client': {'email': 'b@example.com'}}},
+            ])
+        
+        self.assertTrue(results[1]['success'])
+        self.assertEqual(results[1]['deal_id'], 'd-o2')
+    
+    def test_unavailable_hubspot_marks_only_pending_deals(self):
+        def create_deals_chunk(chunk):
+            if len(chunk) > 1:
+                raise DealApiException(status=400)
+            if chunk[0]['gigradar_opportunity_id'] == 'o2':
+                raise DealApiException(status=503)
+            return _fake_create_deals(chunk)
+        self.service._create_deals_chunk.side_effect = create_deals_chunk
+        
+        with self.assertLogs('integrations.services', level='WARNING'):
+            results = self.service.process_gigradar_opportunities([{'id': 'o1'}, {'id': 'o2'}, {'id': 'o3'}])
+        
+        self.assertEqual([result['retry'] for result in results], [False, True, True])
+        self.assertEqual(results[0]['deal_id'], 'd-o1')
+        self.assertTrue(results[0]['success'])
+        self.service._associate_deals_to_contacts.assert_called_once()
+
+
+class FlushOpportunitiesTests(SimpleTestCase):
+    """Обробка черги opportunity задачею Celery"""
+    
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.service = mock.Mock()
+        for target, value in (
+            ('integrations.tasks.get_redis', self.redis),
+            ('integrations.tasks.get_hubspot_service', self.service),
+        ):
+            patcher = mock.patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def test_processes_queue_in_batches(self):
+        for index in range(3):
+            tasks.queue_opportunity({'id': f'o{index}'})
+        self.service.process_gigradar_opportunities.side_effect = lambda batch: [
+            {'success': True, 'retry': False} for _ in batch
+        ]
+        
+        self.assertEqual(tasks.flush_opportunities(), 3)
+        self.assertEqual(self.redis.lists[tasks.OPPORTUNITY_QUEUE_KEY], [])
+    
+    def test_failed_batch_is_requeued(self):
+        tasks.queue_opportunity({'id': 'o1'})
+        self.service.process_gigradar_opportunities.side_effect = RuntimeError('HubSpot down')
+        
+        with self.assertLogs('integrations.tasks', level='ERROR'), self.assertRaises(RuntimeError):
+            tasks.flush_opportunities()
+        self.assertEqual(
+            [orjson.loads(item) for item in self.redis.lists[tasks.OPPORTUNITY_QUEUE_KEY]],
+            [{'id': 'o1'}],
+        )
+    
+    def test_only_pending_opportunities_are_requeued(self):
+        tasks.queue_opportunity({'id': 'o1'})
+        tasks.queue_opportunity({'id': 'o2'})
+        self.service.process_gigradar_opportunities.return_value = [
+            {'success': True, 'retry': False},
+            {'success': False, 'retry': True},
+        ]
+        
+        with self.assertRaises(HubSpotRetryableError):
+            tasks.flush_opportunities()
+        self.assertEqual(
+            [orjson.loads(item) for item in self.redis.lists[tasks.OPPORTUNITY_QUEUE_KEY]],
+            [{'id': 'o2'}],
+        )
@@ -1,19 +1,86 @@
 """
 Views для обробки webhook від Gigradar
 """
-import json
+import base64
+import hmac
+import io
+import itertools
 import logging
-from django.http import JsonResponse, HttpResponse
+import ijson
+import orjson
+from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
 from django.views import View
-from integrations.services import HubSpotService
 from integrations.models import GigradarProposal
+from integrations.dedup import is_duplicate_proposal, proposal_seen_key
+from integrations.tasks import queue_opportunity, queue_proposal
 import os
 
 logger = logging.getLogger(__name__)
 
+# Налаштування webhook читаються один раз при імпорті
+_WEBHOOK_TOKEN = os.getenv('WEBHOOK_TOKEN')
+_WEBHOOK_USERNAME = os.getenv('WEBHOOK_USERNAME')
+_WEBHOOK_PASSWORD = os.getenv('WEBHOOK_PASSWORD')
+
+
+# Межі попереднього перегляду тіла: розмір буфера парсера та кількість подій парсера
+_PEEK_BUF_SIZE = 256
+_PEEK_MAX_EVENTS = 16
+
+
+def _peek_event_type(body: bytes):
+    """
+    Шукає "event" на початку тіла потоковим парсером, не будуючи дерево об'єктів
+    
+    Gigradar передає "event" першим ключем, тому зазвичай вистачає перших
+    сотень байтів. Перегляд обмежений _PEEK_MAX_EVENTS подіями парсера і
+    зупиняється на ключі "data", якщо "event" ще не знайдено
+    
+    Тип події повертається лише якщо весь переглянутий префікс - валідний JSON.
+    Помилки далі за префіксом не перевіряються: невідома подія з таким тілом
+    отримує 200 "received but not processed", бо її тіло все одно не обробляється
+    
+    Returns:
+        Тип події або None, якщо його не видно на початку тіла
+        (тоді тип береться з повністю розпарсеного JSON)
+    
+    Raises:
+        ijson.JSONError: Переглянутий префікс не є валідним JSON
+    """
+    event_type = None
+    parser = ijson.parse(io.BytesIO(body), buf_size=_PEEK_BUF_SIZE)
+    for prefix, event, value in itertools.islice(parser, _PEEK_MAX_EVENTS):
+        if event_type is not None:
+            # Дочитуємо префікс, щоб помилка JSON одразу після "event" дала 400
+            continue
+        if prefix == 'event' and value:
+            event_type = value
+        elif prefix == '' and event == 'map_key' and value == 'data':
+            return None
+    return event_type
+
+
+def _is_valid_basic_auth(auth_header: str) -> bool:
+    """Перевіряє Basic облікові дані webhook (порівняння за сталий час)"""
+    if not auth_header.startswith('Basic '):
+        return False
+    try:
+        credentials = base64.b64decode(auth_header[len('Basic '):]).decode('utf-8')
+    except (ValueError, UnicodeDecodeError):
+        return False
+    username, _, password = credentials.partition(':')
+    username_valid = hmac.compare_digest(username.encode(), _WEBHOOK_USERNAME.encode())
+    password_valid = hmac.compare_digest(password.encode(), _WEBHOOK_PASSWORD.encode())
+    return username_valid and password_valid
+
+
+def json_response(data: dict, status: int = 200) -> HttpResponse:
+    """JSON відповідь, серіалізована orjson"""
+    return HttpResponse(orjson.dumps(data), status=status, content_type='application/json')
+
 
 @method_decorator(csrf_exempt, name='dispatch')
 class GigradarWebhookView(View):
@@ -22,6 +89,13 @@ class GigradarWebhookView(View):
     Формат URL: /hooks/catch/<webhook_token>/
     """
     
+    # Тип події -> метод-обробник
+    _HANDLERS = {
+        "GIGRADAR.OPPORTUNITY.CREATE": "_handle_opportunity_create",
+        "GIGRADAR.PROPOSAL.UPDATE": "_handle_proposal_update",
+        "GIGRADAR.PROPOSAL.CREATE": "_handle_proposal_update",
+    }
+    
     def post(self, request, webhook_token):
         """
         Обробляє POST запит від Gigradar webhook
@@ -41,113 +115,101 @@ class GigradarWebhookView(View):
         """
         try:
             # Валідуємо webhook токен
-            valid_token = os.getenv('WEBHOOK_TOKEN')
-            if valid_token and webhook_token != valid_token:
+            if _WEBHOOK_TOKEN and not hmac.compare_digest(webhook_token.encode(), _WEBHOOK_TOKEN.encode()):
                 logger.warning(f"Невірний webhook токен: {webhook_token}")
-                return JsonResponse(
+                return json_response(
                     {"error": "Invalid webhook token"},
                     status=401
                 )
             
-            # Парсимо JSON
+            # Перевіряємо базову аутентифікацію (якщо налаштовано, опціонально)
+            if _WEBHOOK_USERNAME and _WEBHOOK_PASSWORD:
+                auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+                if not _is_valid_basic_auth(auth_header):
+                    return json_response(
+                        {"error": "Authentication required"},
+                        status=401
+                    )
+            
+            # Отримуємо тип події
             try:
-                payload = json.loads(request.body)
-            except json.JSONDecodeError:
+                event_type = _peek_event_type(request.body)
+            except ijson.JSONError:
                 logger.error("Невірний JSON формат в webhook")
-                return JsonResponse(
+                return json_response(
                     {"error": "Invalid JSON format"},
                     status=400
                 )
             
-            # Перевіряємо базову аутентифікацію (якщо налаштовано, опціонально)
-            webhook_username = os.getenv('WEBHOOK_USERNAME')
-            webhook_password = os.getenv('WEBHOOK_PASSWORD')
+            # Невідомі події відкидаємо без повного парсингу тіла
+            if event_type is not None and event_type not in self._HANDLERS:
+                return self._unknown_event(event_type)
             
-            if webhook_username and webhook_password:
-                from django.contrib.auth import authenticate
-                auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-                if not auth_header.startswith('Basic '):
-                    return JsonResponse(
-                        {"error": "Authentication required"},
-                        status=401
-                    )
+            # Парсимо JSON
+            try:
+                payload = orjson.loads(request.body)
+            except orjson.JSONDecodeError:
+                logger.error("Невірний JSON формат в webhook")
+                return json_response(
+                    {"error": "Invalid JSON format"},
+                    status=400
+                )
             
-            # Отримуємо тип події
-            event_type = payload.get("event") or payload.get("type")
-            data = payload.get("data") or payload
+            if event_type is None:
+                event_type = payload.get("event") or payload.get("type")
             
             logger.info(f"Отримано webhook подію: {event_type}")
             
-            # Обробляємо різні типи подій
-            if event_type == "GIGRADAR.OPPORTUNITY.CREATE":
-                return self._handle_opportunity_create(data)
-            elif event_type == "GIGRADAR.PROPOSAL.UPDATE" or event_type == "GIGRADAR.PROPOSAL.CREATE":
-                return self._handle_proposal_update(data)
-            else:
-                logger.warning(f"Невідомий тип події: {event_type}")
-                # Повертаємо 200 OK, щоб Gigradar не повторював запит
-                return JsonResponse({"status": "received", "message": f"Event {event_type} received but not processed"})
+            handler_name = self._HANDLERS.get(event_type)
+            if handler_name is None:
+                return self._unknown_event(event_type)
+            
+            data = payload.get("data") or payload
+            
+            return getattr(self, handler_name)(data)
         
         except Exception as e:
             logger.error(f"Помилка обробки webhook: {e}", exc_info=True)
             # Повертаємо 200 OK, щоб Gigradar не повторював запит
             # Помилки логуються для подальшого аналізу
-            return JsonResponse(
+            return json_response(
                 {"status": "error", "message": "Internal server error"},
                 status=200
             )
     
-    def _handle_opportunity_create(self, data: dict) -> JsonResponse:
+    def _unknown_event(self, event_type) -> HttpResponse:
+        """Відповідь на подію, яку webhook не обробляє"""
+        logger.warning(f"Невідомий тип події: {event_type}")
+        # Повертаємо 200 OK, щоб Gigradar не повторював запит
+        return json_response({"status": "received", "message": f"Event {event_type} received but not processed"})
+    
+    def _handle_opportunity_create(self, data: dict) -> HttpResponse:
         """
         Обробляє подію створення opportunity
         
+        Виклики HubSpot API виконуються пачками у Celery воркері, тому Gigradar
+        отримує відповідь одразу після постановки opportunity в чергу
+        
         Args:
             data: Дані opportunity з webhook
         """
         try:
-            # Ініціалізуємо HubSpot сервіс
-            hubspot_service = HubSpotService()
+            queue_opportunity(data)
             
-            # Обробляємо opportunity
-            result = hubspot_service.process_gigradar_opportunity(data)
-            
-            if result["success"]:
-                logger.info(
-                    f"Opportunity успішно оброблено. "
-                    f"Contact ID: {result['contact_id']}, Deal ID: {result['deal_id']}"
-                )
-                return JsonResponse({
-                    "status": "success",
-                    "message": "Opportunity processed successfully",
-                    "contact_id": result["contact_id"],
-                    "deal_id": result["deal_id"]
-                })
-            else:
-                logger.warning(
-                    f"Помилка обробки opportunity: {result.get('errors', [])}"
-                )
-                return JsonResponse({
-                    "status": "partial_success",
-                    "message": "Opportunity processed with errors",
-                    "errors": result.get("errors", [])
-                })
-        
-        except ValueError as e:
-            # Помилка конфігурації (наприклад, відсутній токен)
-            logger.error(f"Помилка конфігурації HubSpot: {e}")
-            return JsonResponse({
-                "status": "error",
-                "message": "HubSpot configuration error"
-            }, status=200)  # Все одно 200, щоб не повторювати
+            logger.info(f"Opportunity поставлено в чергу на обробку: {data.get('id')}")
+            return json_response({
+                "status": "queued",
+                "message": "Opportunity queued for processing"
+            })
         
         except Exception as e:
-            logger.error(f"Помилка обробки opportunity: {e}", exc_info=True)
-            return JsonResponse({
+            logger.error(f"Помилка постановки opportunity в чергу: {e}", exc_info=True)
+            return json_response({
                 "status": "error",
                 "message": "Failed to process opportunity"
             }, status=200)  # Все одно 200, щоб не повторювати
     
-    def _handle_proposal_update(self, data: dict) -> JsonResponse:
+    def _handle_proposal_update(self, data: dict) -> HttpResponse:
         """
         Обробляє подію оновлення/створення proposal
         
@@ -155,34 +217,45 @@ class GigradarWebhookView(View):
             data: Дані proposal з webhook
         """
         try:
-            # Зберігаємо proposal в базу даних
-            proposal = GigradarProposal.create_from_webhook_data(data)
+            proposal = GigradarProposal.build_from_webhook_data(data)
+            
+            # Gigradar повторює доставку - така сама подія не потребує запису в БД
+            seen_key = proposal_seen_key(proposal.proposal_id, data)
+            if is_duplicate_proposal(seen_key):
+                logger.info(f"Повторна подія proposal пропущена: {proposal.proposal_id}")
+                return json_response({
+                    "status": "duplicate",
+                    "message": "Proposal already received",
+                    "proposal_id": proposal.proposal_id,
+                })
+            
+            # Ставимо proposal в чергу, він буде збережений пачкою
+            queue_proposal(data, seen_key)
             
             logger.info(
-                f"Proposal збережено в БД: {proposal.proposal_id}, "
+                f"Proposal поставлено в чергу на збереження: {proposal.proposal_id}, "
                 f"статус: {proposal.status}, помилка: {proposal.has_error}"
             )
             
             # Можна додати логіку оновлення deal в HubSpot, якщо потрібно
             # Наприклад, оновити статус deal на основі статусу proposal
             
-            return JsonResponse({
-                "status": "success",
-                "message": "Proposal saved successfully",
+            return json_response({
+                "status": "queued",
+                "message": "Proposal queued for saving",
                 "proposal_id": proposal.proposal_id,
-                "saved_at": proposal.created.isoformat()
             })
         
         except ValueError as e:
             logger.error(f"Помилка збереження proposal: {e}")
-            return JsonResponse({
+            return json_response({
                 "status": "error",
                 "message": f"Failed to save proposal: {str(e)}"
             }, status=200)  # Все одно 200, щоб не повторювати
         
         except Exception as e:
             logger.error(f"Помилка обробки proposal: {e}", exc_info=True)
-            return JsonResponse({
+            return json_response({
                 "status": "error",
                 "message": "Failed to process proposal"
             }, status=200)  # Все одно 200, щоб не повторювати
@@ -194,7 +267,7 @@ def webhook_health_check(request):
     """
     Health check endpoint для перевірки доступності webhook
     """
-    return JsonResponse({
+    return json_response({
         "status": "ok",
         "service": "Gigradar Webhook Handler"
     })
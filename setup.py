@@ -0,0 +1,20 @@
+"""
+Компіляція гарячого шляху розбору webhook у C-розширення mypyc
+
+    python setup.py build_ext --inplace
+
+Поруч з integrations/_parse.py з'являється _parse.*.so, який Python імпортує
+замість .py, тому після змін у _parse.py збірку треба повторити (або видалити .so).
+Без збірки модуль працює як звичайний Python код
+"""
+from setuptools import setup
+from mypyc.build import mypycify
+
+setup(
+    name='hubspot',
+    packages=[],
+    ext_modules=mypycify([
+        '--ignore-missing-imports',
+        'integrations/_parse.py',
+    ]),
+)